@@ -0,0 +1,69 @@
+"Benchmark of list page compression: CPU cost and bytes saved per request"
+
+import time
+import uuid
+from decimal import Decimal
+from datetime import datetime
+
+from pydantic import TypeAdapter
+
+from src.compression import (
+    CompressedResponseCache,
+    available_encodings,
+    encode_body,
+)
+from src.products.schemas import ProductSchema
+
+
+PAGE_SIZE = 100
+ROUNDS = 200
+
+
+def make_page() -> bytes:
+    "Function builds a list page of products as it is sent to clients"
+    category_id = str(uuid.uuid4())
+    products = [
+        ProductSchema(
+            id=str(uuid.uuid4()),
+            name=f"Product {number}",
+            description="Simple product description for the catalog page",
+            price=Decimal("10.00") + number,
+            discount=number % 30,
+            quantity=number * 3,
+            category_id=category_id,
+            image="/media/default/products.png",
+            date_created=datetime.utcnow(),
+        )
+        for number in range(PAGE_SIZE)
+    ]
+    return TypeAdapter(list[ProductSchema]).dump_json(products)
+
+
+def main() -> None:
+    "Function prints compression results for every available encoding"
+    page = make_page()
+    print(f"page size: {len(page)} bytes, {PAGE_SIZE} products")
+
+    for encoding in available_encodings():
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            body, _ = encode_body(page, encoding)
+        compress_time = (time.perf_counter() - started) / ROUNDS
+
+        cache = CompressedResponseCache()
+        cache.set(cache.version, ("page",), body, encoding)
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            cache.get(cache.version, ("page",))
+        hit_time = (time.perf_counter() - started) / ROUNDS
+
+        print(
+            f"{encoding:>5}: {len(body):>6} bytes "
+            f"(saved {len(page) - len(body)} bytes, {len(body) / len(page):.1%}), "
+            f"compress {compress_time * 1e6:.0f} us/request, "
+            f"cache hit {hit_time * 1e6:.2f} us/request"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"Benchmark of text uuid4 against native uuid7 primary keys: index size, inserts, lookups"
+
+import asyncio
+import random
+import time
+import uuid
+
+from sqlalchemy import Column, MetaData, String, Table, Uuid, func, insert, select, text
+
+from src.database import engine
+from src.utils import new_id
+
+
+ROWS = 200_000
+BATCH = 5_000
+LOOKUPS = 5_000
+
+metadata = MetaData()
+
+text_table = Table(
+    "bench_text_ids", metadata,
+    Column("id", String, primary_key=True),
+    Column("name", String),
+)
+uuid_table = Table(
+    "bench_uuid_ids", metadata,
+    Column("id", Uuid(as_uuid=False), primary_key=True),
+    Column("name", String),
+)
+
+
+async def index_size(connection, table: Table) -> str:
+    "Coroutine returns primary key index size where the database reports it"
+    if connection.dialect.name != "postgresql":
+        return "n/a"
+    size = await connection.scalar(
+        text("SELECT pg_size_pretty(pg_relation_size(:index))"),
+        {"index": f"{table.name}_pkey"}
+    )
+    return str(size)
+
+
+async def run(table: Table, make_id) -> None:
+    "Coroutine inserts rows, looks them up and prints results"
+    ids = [make_id() for _ in range(ROWS)]
+
+    started = time.perf_counter()
+    for start in range(0, ROWS, BATCH):
+        async with engine.begin() as connection:
+            await connection.execute(
+                insert(table),
+                [{"id": row_id, "name": "product"} for row_id in ids[start:start + BATCH]]
+            )
+    insert_time = time.perf_counter() - started
+
+    lookup_ids = random.sample(ids, LOOKUPS)
+    async with engine.connect() as connection:
+        started = time.perf_counter()
+        for row_id in lookup_ids:
+            await connection.execute(select(table.c.name).where(table.c.id==row_id))
+        lookup_time = time.perf_counter() - started
+        rows = await connection.scalar(select(func.count()).select_from(table))
+        size = await index_size(connection, table)
+
+    print(
+        f"{table.name}: {rows} rows, pk index {size}, "
+        f"insert {ROWS / insert_time:.0f} rows/s, "
+        f"lookup {lookup_time / LOOKUPS * 1e6:.0f} us/row"
+    )
+
+
+async def main() -> None:
+    "Coroutine recreates benchmark tables and runs both variants"
+    async with engine.begin() as connection:
+        await connection.run_sync(metadata.drop_all)
+        await connection.run_sync(metadata.create_all)
+    try:
+        await run(text_table, lambda: str(uuid.uuid4()))
+        await run(uuid_table, new_id)
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
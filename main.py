@@ -1,23 +1,62 @@
 "Main project file with base roots"
 
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from src import create_tables, engine, IN_MEMORY_DATABASE
+from src.compression import CompressionMiddleware
+from src.jobs import job_queue, job_router, QueueFullError
+from src.ratelimit import RateLimitMiddleware
+from src.products.routers import category_router, product_router, change_router
 
-from src.products.routers import category_router, product_router
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    "Starts background job workers for the application lifetime"
+    if IN_MEMORY_DATABASE:
+        await create_tables(dispose=False)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    # pooled connections are closed, aiosqlite threads would keep the process alive
+    await engine.dispose()
 
 
 app = FastAPI(
     title="FastApi Products",
     description="Simple pet project",
-    docs_url="/"
+    docs_url="/",
+    lifespan=lifespan
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RateLimitMiddleware)
 
 app.include_router(category_router)
 app.include_router(product_router)
+app.include_router(change_router)
+app.include_router(job_router)
+
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(_: Request, error: QueueFullError):
+    "Returns 503 when background jobs can not be accepted"
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(error)},
+        headers={"Retry-After": "1"}
+    )
 
 
 if __name__ == "__main__":
+    if "create_tables" in sys.argv:
+        asyncio.run(create_tables())
+
     uvicorn.run(
         app=app,
         host="127.0.0.1",
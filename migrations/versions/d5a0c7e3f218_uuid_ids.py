@@ -0,0 +1,72 @@
+"""uuid ids
+
+Revision ID: d5a0c7e3f218
+Revises: 8c1f4a6b2d90
+Create Date: 2026-10-19 14:00:00.000000
+
+Opt-in: converts category and product ids to native UUID only when
+ID_MODE=uuid is set and the database is PostgreSQL, otherwise it is a
+no-op. Set ID_MODE the same way for the application after upgrading.
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a0c7e3f218'
+down_revision: Union[str, None] = '8c1f4a6b2d90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    ('category', 'id'),
+    ('product', 'id'),
+    ('product', 'category_id'),
+)
+
+
+def is_uuid_schema() -> bool:
+    bind = op.get_bind()
+    columns = sa.inspect(bind).get_columns('category')
+    return any(
+        column['name'] == 'id' and isinstance(column['type'], sa.Uuid)
+        for column in columns
+    )
+
+
+def alter_ids(type_: sa.types.TypeEngine, cast: str) -> None:
+    op.drop_constraint('product_category_id_fkey', 'product', type_='foreignkey')
+    for table, column in COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=type_,
+            postgresql_using=f'{column}::{cast}'
+        )
+    op.create_foreign_key(
+        'product_category_id_fkey',
+        'product',
+        'category',
+        ['category_id'],
+        ['id'],
+        ondelete='SET NULL'
+    )
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    if os.getenv('ID_MODE', 'string').lower() != 'uuid' or is_uuid_schema():
+        return
+    alter_ids(sa.Uuid(as_uuid=False), 'uuid')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql' or not is_uuid_schema():
+        return
+    alter_ids(sa.String(), 'text')
@@ -4,9 +4,17 @@ from .utils import (
     create_tables,
     download_image,
     download_image_base64,
+    enqueue_image,
 )
 
 from .database import (
+    Base,
     session,
     engine,
+    IN_MEMORY_DATABASE,
+)
+
+from .jobs import (
+    job_queue,
+    QueueFullError,
 )
@@ -0,0 +1,179 @@
+"Module for negotiated response compression and compressed responses cache"
+
+import gzip
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MINIMUM_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+SKIPPED_MEDIA_TYPES = ("text/event-stream", "image/")
+
+
+def available_encodings() -> tuple[str, ...]:
+    "Function returns supported encodings in order of preference"
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    "Function picks the best supported encoding from Accept-Encoding header"
+    accepted: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    "Function compresses bytes with the given encoding"
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def encode_body(data: bytes, encoding: str | None) -> tuple[bytes, str | None]:
+    "Function compresses body if it is large enough and encoding is negotiated"
+    if encoding is None or len(data) < MINIMUM_SIZE:
+        return data, None
+    return compress(data, encoding), encoding
+
+
+class CompressedResponseCache:
+    """Bounded LRU cache of encoded bodies keyed by data version.
+
+    The version comes from the caller and should be shared by all
+    processes (e.g. the last change log sequence number), so a write in
+    one process makes the pages of the others stale too. Entries of
+    versions older than the newest one seen are dropped.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.version = 0
+        self._entries: OrderedDict[tuple, tuple[bytes, str | None]] = OrderedDict()
+
+    def get(self, version: int, key: tuple) -> tuple[bytes, str | None] | None:
+        "Method returns cached body and encoding or None"
+        if version > self.version:
+            self.version = version
+            self._entries.clear()
+        entry = self._entries.get((version, *key))
+        if entry is not None:
+            self._entries.move_to_end((version, *key))
+        return entry
+
+    def set(self, version: int, key: tuple, body: bytes, encoding: str | None) -> None:
+        "Method stores body for the version it was built from"
+        if version < self.version:
+            return
+        self._entries[(version, *key)] = (body, encoding)
+        self._entries.move_to_end((version, *key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        "Method drops all entries after data has changed in this process"
+        self._entries.clear()
+
+
+class CompressionMiddleware:
+    "ASGI middleware compressing complete responses by Accept-Encoding"
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            headers = dict(
+                (name.lower(), value) for name, value in start_message["headers"]
+            )
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or b"content-encoding" in headers
+                or content_type.startswith(SKIPPED_MEDIA_TYPES)
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding)
+            vary = headers.get(b"vary")
+            start_message["headers"] = [
+                (name, value) for name, value in start_message["headers"]
+                if name.lower() not in (b"content-length", b"vary")
+            ] + [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -2,6 +2,8 @@
 
 import os
 
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
@@ -13,16 +15,47 @@ class Base(DeclarativeBase):
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "true").lower() == "true"
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
 
 if DATABASE_URL:
+    IS_SQLITE = DATABASE_URL.startswith("sqlite")
+    IN_MEMORY_DATABASE = IS_SQLITE and (
+        ":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/").endswith(":")
+    )
+
+    engine_options = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+    }
+    if IN_MEMORY_DATABASE:
+        # in-memory database lives as long as its single connection,
+        # so the pool keeps exactly one and sessions take turns on it
+        engine_options.update(pool_size=1, max_overflow=0)
+
+    # requests over this number would wait for a connection from the pool
+    POOL_CONNECTIONS = engine_options["pool_size"] + engine_options["max_overflow"]
+
     engine = create_async_engine(
         url=DATABASE_URL,
-        echo=True
+        echo=DATABASE_ECHO,
+        **engine_options
     )
     session = async_sessionmaker(
         bind=engine,
         expire_on_commit=True
     )
+
+    if IS_SQLITE:
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def enable_foreign_keys(dbapi_connection, _) -> None:
+            "SQLite needs foreign keys enabled per connection for ON DELETE"
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
 else:
 
     class DatabaseConnectionError(Exception):
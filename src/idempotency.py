@@ -0,0 +1,100 @@
+"Module for Idempotency-Key support of create endpoints"
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from fastapi import HTTPException
+
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+
+Result = TypeVar("Result")
+
+
+def fingerprint(*parts: Any) -> str:
+    "Function returns hash of request data a stored result was made from"
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Bounded TTL store of results by idempotency key.
+
+    A repeated key returns the stored result without calling the endpoint
+    logic again. Concurrent calls with the same key wait for the first one;
+    if it fails nothing is stored and the next waiter runs the call itself.
+    A repeated key with another request fingerprint is rejected with 422.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = IDEMPOTENCY_MAX_KEYS,
+        ttl: float = IDEMPOTENCY_TTL,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, str | None, Any]] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Event] = {}
+
+    def _get(self, key: Hashable, request_hash: str | None) -> tuple[bool, Any]:
+        "Method returns stored result if it is not expired"
+        now = time.monotonic()
+        while self._entries:
+            oldest_key, (expires, _, _) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[oldest_key]
+
+        if key not in self._entries:
+            return False, None
+        _, stored_hash, result = self._entries[key]
+        if stored_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with another request"
+            )
+        return True, result
+
+    def _set(self, key: Hashable, request_hash: str | None, result: Any) -> None:
+        "Method stores result and evicts the oldest keys over the bound"
+        self._entries[key] = (time.monotonic() + self.ttl, request_hash, result)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def run(
+        self,
+        key: Hashable | None,
+        call: Callable[[], Awaitable[Result]],
+        request_hash: str | None = None
+    ) -> Result:
+        "Coroutine returns stored result for key or runs call once and stores it"
+        if key is None:
+            return await call()
+
+        while True:
+            found, result = self._get(key, request_hash)
+            if found:
+                return result
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            await pending.wait()
+
+        pending = asyncio.Event()
+        self._pending[key] = pending
+        try:
+            result = await call()
+            self._set(key, request_hash, result)
+            return result
+        finally:
+            del self._pending[key]
+            pending.set()
+
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,241 @@
+"In-process background job queue persisted to the jobs table"
+
+import os
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from fastapi import APIRouter
+from sqlalchemy import JSON, delete, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .database import Base, session
+
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_PERSIST = os.getenv("JOB_PERSIST", "true").lower() == "true"
+
+
+class Job(Base):
+    "background job model"
+
+    __tablename__ = "job"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str]
+    payload: Mapped[dict] = mapped_column(JSON)
+    status: Mapped[str] = mapped_column(default="pending", index=True)
+    attempts: Mapped[int] = mapped_column(default=0)
+    error: Mapped[str | None]
+    date_created: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    date_finished: Mapped[datetime | None]
+
+    def __repr__(self) -> str:
+        return f"<Job.{self.name}: {self.id} {self.status}>"
+
+
+class QueueFullError(Exception):
+    "Exception raised when the job queue has no free slots"
+
+
+class JobQueue:
+    """Bounded queue of jobs executed by a pool of worker tasks.
+
+    Jobs are saved as pending before they are queued and marked done or
+    failed after the last attempt, so pending jobs of a stopped process
+    are queued again on the next start. Saved jobs that did not fit into
+    the queue are fed from the table as it drains. Payloads should hold references
+    (e.g. file paths), not data; they are cleared once a job is done.
+    """
+
+    def __init__(
+        self,
+        async_session: async_sessionmaker[AsyncSession],
+        workers: int = JOB_WORKERS,
+        max_size: int = JOB_QUEUE_SIZE,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_delay: float = 0.5,
+        persist: bool = JOB_PERSIST,
+    ) -> None:
+        self.async_session = async_session
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.persist = persist
+        self.handlers: dict[str, Callable[..., Awaitable[Any]]] = {}
+        self._queue: asyncio.Queue | None = None
+        self._queued_ids: set[int] = set()
+        self._backlog = False
+        self._refill_lock = asyncio.Lock()
+        self._tasks: list[asyncio.Task] = []
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._counters = {"enqueued": 0, "done": 0, "failed": 0, "retried": 0}
+
+    def task(self, name: str) -> Callable:
+        "Decorator registers a coroutine function as job handler"
+        def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        "Queue is created lazily to bind it to the running loop"
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        return self._queue
+
+    async def enqueue(self, name: str, **payload: Any) -> None:
+        "Coroutine saves and queues a job, raises QueueFullError when full"
+        if name not in self.handlers:
+            raise KeyError(f"Unknown job: {name}")
+        if self.queue.full():
+            raise QueueFullError("Job queue is full")
+
+        job_id = None
+        if self.persist:
+            async with self.async_session() as db_session:
+                job = Job(name=name, payload=payload)
+                db_session.add(job)
+                await db_session.flush()
+                job_id = job.id
+                # reserved before commit so a refill can not queue it twice
+                self._queued_ids.add(job_id)
+                await db_session.commit()
+
+        try:
+            self.queue.put_nowait((job_id, name, payload, time.monotonic()))
+        except asyncio.QueueFull as error:
+            if job_id is not None:
+                self._queued_ids.discard(job_id)
+                async with self.async_session() as db_session:
+                    await db_session.execute(delete(Job).filter(Job.id==job_id))
+                    await db_session.commit()
+            raise QueueFullError("Job queue is full") from error
+        self._counters["enqueued"] += 1
+
+    async def _refill(self) -> None:
+        "Coroutine queues saved pending jobs while the queue has room"
+        async with self._refill_lock:
+            free = self.max_size - self.queue.qsize()
+            if free <= 0:
+                return
+            async with self.async_session() as db_session:
+                result = await db_session.execute(
+                    select(Job)
+                    .filter(Job.status=="pending", Job.id.not_in(self._queued_ids))
+                    .order_by(Job.id)
+                    .limit(free)
+                )
+                jobs = result.scalars().all()
+            for job in jobs:
+                self._queued_ids.add(job.id)
+                self.queue.put_nowait((job.id, job.name, job.payload, time.monotonic()))
+            self._backlog = len(jobs) == free
+
+    async def start(self) -> None:
+        "Coroutine queues pending jobs saved earlier and starts workers"
+        if self.persist:
+            await self._refill()
+
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        "Coroutine stops workers, unfinished jobs stay pending"
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._queued_ids.clear()
+        self._backlog = False
+
+    async def join(self) -> None:
+        "Coroutine waits until every queued job is processed"
+        await self.queue.join()
+
+    def metrics(self) -> dict[str, Any]:
+        "Method returns queue depth, counters and job latency in seconds"
+        latencies = sorted(self._latencies)
+        return {
+            "depth": self.queue.qsize(),
+            "max_size": self.max_size,
+            "workers": len(self._tasks),
+            **self._counters,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    async def _work(self) -> None:
+        "Coroutine of a single worker"
+        while True:
+            job_id, name, payload, enqueued = await self.queue.get()
+            try:
+                await self._run(job_id, name, payload)
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Job %s %s could not be saved", name, job_id)
+            finally:
+                self._latencies.append(time.monotonic() - enqueued)
+                self._queued_ids.discard(job_id)
+                self.queue.task_done()
+            if self._backlog:
+                try:
+                    await self._refill()
+                except Exception:  # pylint: disable=broad-exception-caught
+                    logger.exception("Pending jobs could not be loaded")
+
+    async def _run(self, job_id: int | None, name: str, payload: dict) -> None:
+        "Coroutine runs a job with retries and saves its result"
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.handlers[name](**payload)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.warning("Job %s %s failed on attempt %s: %s", name, job_id, attempt, error)
+                if attempt == self.max_attempts:
+                    self._counters["failed"] += 1
+                    await self._save(job_id, status="failed", attempts=attempt, error=repr(error))
+                    return
+                self._counters["retried"] += 1
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            else:
+                self._counters["done"] += 1
+                await self._save(job_id, status="done", attempts=attempt, payload={})
+                return
+
+    async def _save(self, job_id: int | None, **values: Any) -> None:
+        "Coroutine updates the saved job row"
+        if job_id is None:
+            return
+        async with self.async_session() as db_session:
+            await db_session.execute(
+                update(Job)
+                .filter(Job.id==job_id)
+                .values(date_finished=datetime.utcnow(), **values)
+            )
+            await db_session.commit()
+
+
+job_queue = JobQueue(async_session=session)
+
+
+job_router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+)
+
+
+@job_router.get("/metrics/", response_model=dict)
+async def read_job_metrics():
+    "Endpoint returns background job queue metrics"
+    return job_queue.metrics()
@@ -1,3 +1,3 @@
 "__init__.py"
 
-from .routers import category_router, product_router
+from .routers import category_router, product_router, change_router
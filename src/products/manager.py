@@ -1,18 +1,103 @@
 "CRUD for category model"
 
+import asyncio
+
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 from sqlalchemy.sql.schema import Sequence
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import select
+from sqlalchemy import delete, func, insert, select, text, update
+
+from src.compression import CompressedResponseCache
 
-from .models import Category, Product
+from .models import Category, Product, Change
+from .pricing import changed_price_expression, reprice_rows
 from .schemas import (
     CategorySchema,
-    CreateProductSchema
+    CreateProductSchema,
+    RepriceSchema,
+    BulkDeleteSchema,
+    MoveCategorySchema,
 )
 
 
+product_pages_cache = CompressedResponseCache(max_entries=256)
+
+
+class ChangeNotifier:
+    """Wakes up change feed listeners after catalog commits.
+
+    Listeners take the event with listen() before reading the change log
+    and wait on it afterwards, so a commit made while they read still
+    wakes them up.
+    """
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+
+    def notify(self) -> None:
+        "Method wakes up all current listeners"
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def listen(self) -> asyncio.Event:
+        "Method returns event set by the next notification"
+        return self._event
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> None:
+        "Coroutine waits for event taken by listen() or timeout"
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+change_notifier = ChangeNotifier()
+
+
+def catalog_changed(products: bool = True) -> None:
+    "Function notifies caches and change feed listeners after commit"
+    if products:
+        product_pages_cache.invalidate()
+    change_notifier.notify()
+
+
+CHANGE_LOG_LOCK = 2028
+
+
+async def log_changes(
+    session: AsyncSession,
+    entity: str,
+    entity_ids: list[str],
+    operation: str
+) -> None:
+    """Coroutine inserts change log entries in the session transaction.
+
+    Sequence numbers are taken when rows are inserted but become visible on
+    commit, so writers are serialized until commit with a transaction-level
+    advisory lock; otherwise a later seq could commit first and readers
+    moving their cursor past it would never see the earlier one. SQLite
+    already allows a single writer at a time.
+
+    Pending ORM changes are flushed first, so every write path takes its
+    row locks before the advisory lock and writers can not deadlock.
+    """
+    await session.flush()
+    if entity_ids:
+        if session.get_bind().dialect.name == "postgresql":
+            await session.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": CHANGE_LOG_LOCK}
+            )
+        await session.execute(
+            insert(Change),
+            [
+                {"entity": entity, "entity_id": entity_id, "operation": operation}
+                for entity_id in entity_ids
+            ]
+        )
+
+
 class CategoryCRUD:
     "CRUD operations class for category"
 
@@ -55,12 +140,14 @@ class CategoryCRUD:
             db_category = Category(**category.dict())
             session.add(db_category)
             try:
+                await log_changes(session, "category", [category.id], "create")
                 await session.commit()
             except IntegrityError as error:
                 raise HTTPException(
                     status_code=400,
                     detail="Category with this name already exists"
                 ) from error
+            catalog_changed(products=False)
             await session.refresh(db_category)
             return db_category
 
@@ -86,12 +173,14 @@ class CategoryCRUD:
 
             category_row.name = category.name
             try:
+                await log_changes(session, "category", [category.id], "update")
                 await session.commit()
             except IntegrityError as error:
                 raise HTTPException(
                     status_code=400,
                     detail="Category with this name already exists"
                 ) from error
+            catalog_changed(products=False)
             await session.refresh(category_row)
             return category_row
 
@@ -109,13 +198,20 @@ class CategoryCRUD:
                 async_session=async_session
             )
             if category:
+                product_ids = await session.scalars(
+                    select(Product.id).filter(Product.category_id==category_id)
+                )
                 await session.delete(instance=category)
+                await session.flush()
+                await log_changes(session, "product", list(product_ids), "update")
+                await log_changes(session, "category", [category_id], "delete")
             else:
                 raise HTTPException(
                     status_code=404,
                     detail="Category not found"
                 )
             await session.commit()
+            catalog_changed()
 
 
 class ProductCRUD:
@@ -126,12 +222,16 @@ class ProductCRUD:
         cls,
         async_session: async_sessionmaker[AsyncSession],
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        category_id: str | None = None
         ) -> Sequence[Product]:  # type: ignore
         "Coroutine for getting array of products"
         async with async_session() as session:
+            query = select(Product)
+            if category_id is not None:
+                query = query.filter(Product.category_id==category_id)
             result = await session.execute(
-                select(Product).offset(skip).limit(limit)
+                query.offset(skip).limit(limit)
             )
 
             return result.scalars().all()  # type: ignore
@@ -160,12 +260,14 @@ class ProductCRUD:
             db_category = Product(**product.dict())
             session.add(db_category)
             try:
+                await log_changes(session, "product", [product.id], "create")
                 await session.commit()
             except IntegrityError as error:
                 raise HTTPException(
                     status_code=404,
                     detail=error,
                 ) from error
+            catalog_changed()
             await session.refresh(db_category)
             return db_category
 
@@ -192,12 +294,14 @@ class ProductCRUD:
                     setattr(product_row, param, value)
 
             try:
+                await log_changes(session, "product", [product.id], "update")
                 await session.commit()
             except IntegrityError as error:
                 raise HTTPException(
                     status_code=404,
                     detail="Category not found"
                 ) from error
+            catalog_changed()
             await session.refresh(product_row)
             return product_row
 
@@ -210,16 +314,171 @@ class ProductCRUD:
     ) -> None:
         "Coroutine for deleting an product instance"
         async with async_session() as session:
-            async with session.begin():
-                product = await cls.get_one(
-                    product_id=product_id,
-                    async_session=async_session
+            deleted_id = await session.scalar(
+                delete(Product)
+                .filter(Product.id==product_id)
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            )
+            if deleted_id is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Product not found"
                 )
-                if product:
-                    await session.delete(instance=product)
-                else:
-                    raise HTTPException(
-                        status_code=404,
-                        detail="Product not found"
-                    )
-                await session.commit()
+            await log_changes(session, "product", [product_id], "delete")
+            await session.commit()
+        catalog_changed()
+
+    @classmethod
+    def _target_filter(
+        cls,
+        product_ids: list[str] | None,
+        category_id: str | None
+    ) -> list:
+        "Method returns where clauses for products selected by ids or category"
+        if product_ids is None and category_id is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Specify product_ids or category_id"
+            )
+        clauses = []
+        if product_ids is not None:
+            clauses.append(Product.id.in_(product_ids))
+        if category_id is not None:
+            clauses.append(Product.category_id==category_id)
+        return clauses
+
+    @classmethod
+    def _reprice_filter(cls, reprice: RepriceSchema) -> list:
+        "Method returns where clauses for repricing target"
+        clauses = cls._target_filter(reprice.product_ids, reprice.category_id)
+        if reprice.percent is None and reprice.discount is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Specify percent or discount"
+            )
+        return clauses
+
+    @classmethod
+    async def preview_reprice(
+        cls,
+        reprice: RepriceSchema,
+        async_session: async_sessionmaker[AsyncSession],
+        skip: int = 0,
+        limit: int = 100
+    ) -> list[tuple]:
+        "Coroutine computes new prices of a page of products without saving them"
+        clauses = cls._reprice_filter(reprice)
+        async with async_session() as session:
+            result = await session.execute(
+                select(Product.id, Product.price, Product.discount)
+                .filter(*clauses)
+                .order_by(Product.id)
+                .offset(skip)
+                .limit(limit)
+            )
+            return reprice_rows(result.all(), reprice.percent, reprice.discount)  # type: ignore
+
+    @classmethod
+    async def reprice(
+        cls,
+        reprice: RepriceSchema,
+        async_session: async_sessionmaker[AsyncSession]
+    ) -> int:
+        "Coroutine reprices products with a single UPDATE and returns its row count"
+        clauses = cls._reprice_filter(reprice)
+        values = {}
+        if reprice.percent is not None:
+            values["price"] = changed_price_expression(Product.price, reprice.percent)
+        if reprice.discount is not None:
+            values["discount"] = reprice.discount
+
+        async with async_session() as session:
+            product_ids = list(await session.scalars(
+                update(Product)
+                .filter(*clauses)
+                .values(**values)
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            ))
+            await log_changes(session, "product", product_ids, "update")
+            await session.commit()
+        catalog_changed()
+        return len(product_ids)
+
+    @classmethod
+    async def bulk_delete(
+        cls,
+        bulk: BulkDeleteSchema,
+        async_session: async_sessionmaker[AsyncSession]
+    ) -> int:
+        "Coroutine deletes products with a single DELETE and returns their count"
+        clauses = cls._target_filter(bulk.product_ids, bulk.category_id)
+        async with async_session() as session:
+            product_ids = list(await session.scalars(
+                delete(Product)
+                .filter(*clauses)
+                .returning(Product.id)
+                .execution_options(synchronize_session=False)
+            ))
+            await log_changes(session, "product", product_ids, "delete")
+            await session.commit()
+        catalog_changed()
+        return len(product_ids)
+
+    @classmethod
+    async def move_category(
+        cls,
+        move: MoveCategorySchema,
+        async_session: async_sessionmaker[AsyncSession]
+    ) -> int:
+        "Coroutine moves all products of a category with a single UPDATE"
+        async with async_session() as session:
+            try:
+                product_ids = list(await session.scalars(
+                    update(Product)
+                    .filter(Product.category_id==move.from_category_id)
+                    .values(category_id=move.to_category_id)
+                    .returning(Product.id)
+                    .execution_options(synchronize_session=False)
+                ))
+            except IntegrityError as error:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Category not found"
+                ) from error
+            await log_changes(session, "product", product_ids, "update")
+            await session.commit()
+        catalog_changed()
+        return len(product_ids)
+
+
+class ChangeCRUD:
+    "Read operations class for catalog change log"
+
+    @classmethod
+    async def last_seq(
+        cls,
+        async_session: async_sessionmaker[AsyncSession]
+        ) -> int:
+        "Coroutine returns sequence number of the latest change or 0"
+        async with async_session() as session:
+            return await session.scalar(select(func.max(Change.seq))) or 0
+
+    @classmethod
+    async def get_since(
+        cls,
+        async_session: async_sessionmaker[AsyncSession],
+        since: int = 0,
+        limit: int = 100
+        ) -> Sequence[Change]:  # type: ignore
+        "Coroutine for getting changes with sequence number greater than since"
+        async with async_session() as session:
+            result = await session.execute(
+                select(Change)
+                .filter(Change.seq > since)
+                .order_by(Change.seq)
+                .limit(limit)
+            )
+
+            return result.scalars().all()  # type: ignore
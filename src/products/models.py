@@ -1,19 +1,26 @@
 "Database models"
 
+import os
 from decimal import Decimal
 from datetime import datetime
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, String, Uuid
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from src.database import Base
 
 
+# ID_MODE=uuid stores ids as native UUID (CHAR(32) where there is no such
+# type) instead of text; the API keeps using the same string format.
+UUID_IDS = os.getenv("ID_MODE", "string").lower() == "uuid"
+IdType = Uuid(as_uuid=False) if UUID_IDS else String
+
+
 class Category(Base):
     "product category model"
 
     __tablename__ = "category"
-    id: Mapped[str] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(IdType, primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
 
     products: Mapped[list["Product"]] = relationship(back_populates="category")
@@ -25,7 +32,7 @@ class Product(Base):
     "main product model"
 
     __tablename__ = "product"
-    id: Mapped[str] = mapped_column(primary_key=True)
+    id: Mapped[str] = mapped_column(IdType, primary_key=True)
     name: Mapped[str]
     description: Mapped[str | None]
     image: Mapped[str] = mapped_column(default="/media/default/products.png")
@@ -33,9 +40,26 @@ class Product(Base):
     discount: Mapped[int] = mapped_column(default=0)
     quantity: Mapped[int] = mapped_column(default=0)
     date_created: Mapped[datetime] = mapped_column(default=datetime.utcnow)
-    category_id: Mapped[str | None] = mapped_column(ForeignKey("category.id", ondelete="SET NULL"))
+    category_id: Mapped[str | None] = mapped_column(
+        IdType,
+        ForeignKey("category.id", ondelete="SET NULL")
+    )
 
     category: Mapped["Category"] = relationship(back_populates="products")
 
     def __repr__(self) -> str:
         return f"<Product.{self.name}: {self.id}>"
+
+
+class Change(Base):
+    "catalog change log (outbox) entry written in the same transaction as the change"
+
+    __tablename__ = "change"
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    entity: Mapped[str]
+    entity_id: Mapped[str]
+    operation: Mapped[str]
+    date_created: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<Change.{self.seq}: {self.operation} {self.entity} {self.entity_id}>"
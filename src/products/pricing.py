@@ -0,0 +1,50 @@
+"Price and discount computations shared by schemas and repricing"
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+
+
+CENT = Decimal("0.01")
+HUNDRED = Decimal(100)
+
+
+def round_price(price: Decimal) -> Decimal:
+    "Function rounds price to cents, halves away from zero like SQL round()"
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def effective_price(price: Decimal | None, discount: int | None) -> Decimal | None:
+    "Function returns price with discount applied"
+    if price is None:
+        return None
+    return round_price(Decimal(price) * (HUNDRED - (discount or 0)) / HUNDRED)
+
+
+def changed_price(price: Decimal, percent: Decimal | None) -> Decimal:
+    "Function returns price changed by percent"
+    if percent is None:
+        return Decimal(price)
+    return round_price(Decimal(price) * (HUNDRED + percent) / HUNDRED)
+
+
+def changed_price_expression(price: ColumnElement, percent: Decimal) -> ColumnElement:
+    "Function returns SQL expression of price changed by percent"
+    return func.round(price * (HUNDRED + percent) / HUNDRED, 2)
+
+
+def reprice_rows(
+    rows: list[tuple[str, Decimal, int]],
+    percent: Decimal | None,
+    discount: int | None,
+) -> list[tuple[str, Decimal, int, Decimal]]:
+    "Function computes new price, discount and effective price for rows"
+    result = []
+    for product_id, price, current_discount in rows:
+        new_price = changed_price(price, percent)
+        new_discount = current_discount if discount is None else discount
+        result.append(
+            (product_id, new_price, new_discount, effective_price(new_price, new_discount))
+        )
+    return result
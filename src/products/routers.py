@@ -2,37 +2,74 @@
 
 import uuid
 import base64
+import asyncio
+import hashlib
 from decimal import Decimal
-
-from fastapi import APIRouter, Form, HTTPException, UploadFile, File
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    HTTPException,
+    UploadFile,
+    File,
+    Request,
+    Response,
+    Header,
+    Query,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
 from src.database import session
-from src.utils import (
-    download_image_base64,
-    download_image,
-)
+from src.compression import encode_body, negotiate_encoding
+from src.utils import enqueue_image, new_id
+from src.idempotency import idempotency_store, fingerprint
+from src.ratelimit import ConcurrencyLimiter, MAX_PAGE_SIZE, client_identity
 
 from .schemas import (
+    EntityId,
     CategorySchema,
     CategorySwaggerSchema,
     ProductSchema,
     CreateProductSchema,
     ProductJsonSwaggerSchema,
     ProductJsonSwaggerUpdateSchema,
+    RepriceSchema,
+    RepricedProductSchema,
+    UpdatedResultSchema,
+    DeletedResultSchema,
+    BulkDeleteSchema,
+    MoveCategorySchema,
+    ChangeSchema,
 )
 
-from .manager import CategoryCRUD, ProductCRUD
+from .manager import (
+    CategoryCRUD,
+    ProductCRUD,
+    ChangeCRUD,
+    product_pages_cache,
+    change_notifier,
+)
 
 
 # CATEGORY ENDPOINTS
 
+# shared by catalog routers, so their requests together fit the database pool
+concurrency_limiter = ConcurrencyLimiter()
+
 category_router = APIRouter(
     prefix="/categories",
     tags=["Categories"],
+    dependencies=[Depends(concurrency_limiter)],
 )
 
 @category_router.get("/list/", response_model=list[CategorySchema])
-async def read_categories(skip: int = 0, limit: int = 100):
+async def read_categories(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
+):
     "Endpoint returns an array of categories"
     return await CategoryCRUD.get_many(
         skip=skip,
@@ -42,7 +79,7 @@ async def read_categories(skip: int = 0, limit: int = 100):
 
 
 @category_router.get("/{category_id}", response_model=CategorySchema)
-async def read_category(category_id: str):
+async def read_category(category_id: EntityId):
     "Endpoint returns a category instance"
     result = await CategoryCRUD.get_one(
         category_id=category_id,
@@ -54,36 +91,59 @@ async def read_category(category_id: str):
     return result
 
 
-@category_router.post("/add/json/", response_model=CategorySchema)
-async def create_category_by_json(category_data: CategorySwaggerSchema):
-    "Endpoint creates a category instance"
+IDEMPOTENCY_KEY = Header(None, max_length=255)
+
+
+def idempotency_scope(request: Request, entity: str, idempotency_key: str | None) -> tuple | None:
+    "Function returns idempotency key scoped to the client the rate limiter sees"
+    if idempotency_key is None:
+        return None
+    return client_identity(request.scope), entity, idempotency_key
+
+
+async def create_category(name: str) -> CategorySchema:
+    "Coroutine creates a category instance with a new id"
     category = CategorySchema(
-        id=str(uuid.uuid4()),
-        name=category_data.name
+        id=new_id(),
+        name=name
     )
     categoty_reponse = await CategoryCRUD.create(
         category=category,
         async_session=session
     )
-    return categoty_reponse
+    return CategorySchema.model_validate(categoty_reponse)
 
 
-@category_router.post("/add/form/", response_model=CategorySchema)
-async def create_category_by_form(name: str = Form()):
-    "Endpoint creates a category instance"
-    category = CategorySchema(
-        id=str(uuid.uuid4()),
-        name=name
+@category_router.post("/add/json/", response_model=CategorySchema)
+async def create_category_by_json(
+    request: Request,
+    category_data: CategorySwaggerSchema,
+    idempotency_key: str | None = IDEMPOTENCY_KEY
+):
+    "Endpoint creates a category instance, repeated Idempotency-Key returns the first result"
+    return await idempotency_store.run(
+        key=idempotency_scope(request, "category", idempotency_key),
+        call=lambda: create_category(name=category_data.name),
+        request_hash=fingerprint(category_data.name) if idempotency_key is not None else None
     )
-    categoty_reponse = await CategoryCRUD.create(
-        category=category,
-        async_session=session
+
+
+@category_router.post("/add/form/", response_model=CategorySchema)
+async def create_category_by_form(
+    request: Request,
+    name: str = Form(),
+    idempotency_key: str | None = IDEMPOTENCY_KEY
+):
+    "Endpoint creates a category instance, repeated Idempotency-Key returns the first result"
+    return await idempotency_store.run(
+        key=idempotency_scope(request, "category", idempotency_key),
+        call=lambda: create_category(name=name),
+        request_hash=fingerprint(name) if idempotency_key is not None else None
     )
-    return categoty_reponse
 
 
 @category_router.put("/update/form/{category_id}", response_model=CategorySchema)
-async def update_category_by_form(category_id: str, name: str = Form()):
+async def update_category_by_form(category_id: EntityId, name: str = Form()):
     "Endpoint updates a category instance"
     category = CategorySchema(
         id=category_id,
@@ -97,7 +157,7 @@ async def update_category_by_form(category_id: str, name: str = Form()):
 
 
 @category_router.put("/update/json/{category_id}", response_model=CategorySchema)
-async def update_category_by_json(category_id: str, category_data: CategorySwaggerSchema):
+async def update_category_by_json(category_id: EntityId, category_data: CategorySwaggerSchema):
     "Endpoint updates a category instance"
     category = CategorySchema(
         id=category_id,
@@ -111,7 +171,7 @@ async def update_category_by_json(category_id: str, category_data: CategorySwagg
 
 
 @category_router.delete("/delete/{category_id}", response_model=dict)
-async def delete_category(category_id: str):
+async def delete_category(category_id: EntityId):
     "Endpoint deletes a category instance"
     await CategoryCRUD().delete(
         category_id=category_id,
@@ -126,21 +186,55 @@ async def delete_category(category_id: str):
 product_router = APIRouter(
     prefix="/products",
     tags=["Products"],
+    dependencies=[Depends(concurrency_limiter)],
 )
 
 
+CACHED_PAGES = 5
+
+products_adapter = TypeAdapter(list[ProductSchema])
+
+
 @product_router.get("/list/", response_model=list[ProductSchema])
-async def read_products(skip: int = 0, limit: int = 100):
-    "Endpoint returns an array of products"
-    return await ProductCRUD().get_many(
-        skip=skip,
-        limit=limit,
-        async_session=session
-    )
+async def read_products(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    category_id: EntityId | None = None
+):
+    "Endpoint returns an array of products, first pages are cached compressed"
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    cacheable = skip < CACHED_PAGES * limit
+    cache_key = (category_id, skip, limit, encoding)
+
+    cached = version = None
+    if cacheable:
+        # change log is shared by all processes, so its last seq is the data version
+        version = await ChangeCRUD.last_seq(async_session=session)
+        cached = product_pages_cache.get(version, cache_key)
+    if cached is None:
+        products = await ProductCRUD().get_many(
+            skip=skip,
+            limit=limit,
+            category_id=category_id,
+            async_session=session
+        )
+        body = products_adapter.dump_json(
+            products_adapter.validate_python(products, from_attributes=True)
+        )
+        cached = encode_body(body, encoding)
+        if version is not None:
+            product_pages_cache.set(version, cache_key, *cached)
+
+    body, encoding = cached
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @product_router.get("/{product_id}", response_model=ProductSchema)
-async def read_product(product_id: str):
+async def read_product(product_id: EntityId):
     "Endpoint returns a product instance"
     product = await ProductCRUD().get_one(
         product_id=product_id,
@@ -152,76 +246,111 @@ async def read_product(product_id: str):
 
 
 @product_router.post("/add/json/", response_model=ProductSchema)
-async def create_product_by_json(product_data: ProductJsonSwaggerSchema):
-    "Endpoint for creating a product instance"
-    image_path = None
-    if product_data.image_base64 and product_data.image_name:
-        image_data = base64.b64decode(product_data.image_base64)
-        image_name = f"{uuid.uuid4()}-{product_data.image_name}"
-        image_path = await download_image_base64(bytes_data=image_data, file_name=image_name)
-
-    product = CreateProductSchema(
-        id=str(uuid.uuid4()),
-        name=product_data.name,
-        description=product_data.description,
-        price=product_data.price,
-        discount=product_data.discount,
-        quantity=product_data.quantity,
-        category_id=product_data.category_id,
-        image=image_path
-    )
-    product_response = await ProductCRUD().create(
-        product=product,
-        async_session=session
+async def create_product_by_json(
+    request: Request,
+    product_data: ProductJsonSwaggerSchema,
+    idempotency_key: str | None = IDEMPOTENCY_KEY
+):
+    "Endpoint for creating a product instance, repeated Idempotency-Key returns the first result"
+    async def create() -> ProductSchema:
+        image_path = None
+        if product_data.image_base64 and product_data.image_name:
+            image_data = base64.b64decode(product_data.image_base64)
+            image_name = f"{uuid.uuid4()}-{product_data.image_name}"
+            image_path = await enqueue_image(bytes_data=image_data, file_name=image_name, encoded=True)
+
+        product = CreateProductSchema(
+            id=new_id(),
+            name=product_data.name,
+            description=product_data.description,
+            price=product_data.price,
+            discount=product_data.discount,
+            quantity=product_data.quantity,
+            category_id=product_data.category_id,
+            image=image_path
+        )
+        product_response = await ProductCRUD().create(
+            product=product,
+            async_session=session
+        )
+        return ProductSchema.model_validate(product_response)
+
+    return await idempotency_store.run(
+        key=idempotency_scope(request, "product", idempotency_key),
+        call=create,
+        request_hash=(
+            fingerprint(product_data.model_dump(mode="json"))
+            if idempotency_key is not None else None
+        )
     )
-    return product_response
 
 
 @product_router.post("/add/form/", response_model=ProductSchema)
 async def create_product_by_form(
+    request: Request,
     name: str = Form(...),
     description: str | None = Form(None),
     price: Decimal | None = Form(Decimal(10.00), ge=0),
     discount: int | None = Form(0, ge=0, le=100),
     quantity: int | None = Form(0, ge=0),
-    category_id: str = Form(...),
-    image: UploadFile | None = File(None)
+    category_id: Annotated[EntityId, Form()] = ...,
+    image: UploadFile | None = File(None),
+    idempotency_key: str | None = IDEMPOTENCY_KEY
 ):
-    "Endpoint for creating a product instance"
-    if image:
-        image_path = await download_image(image.file.read(), f"{uuid.uuid4()}-{image.filename}")
-    product = CreateProductSchema(
-        id=str(uuid.uuid4()),
-        name=name,
-        description=description,
-        price=price,
-        discount=discount,
-        quantity=quantity,
-        category_id=category_id,
-        image=image_path,
+    "Endpoint for creating a product instance, repeated Idempotency-Key returns the first result"
+    async def create() -> ProductSchema:
+        image_path = None
+        if image:
+            image_path = await enqueue_image(await image.read(), f"{uuid.uuid4()}-{image.filename}")
+        product = CreateProductSchema(
+            id=new_id(),
+            name=name,
+            description=description,
+            price=price,
+            discount=discount,
+            quantity=quantity,
+            category_id=category_id,
+            image=image_path,
+        )
+        product_response = await ProductCRUD().create(
+            product=product,
+            async_session=session
+        )
+        return ProductSchema.model_validate(product_response)
+
+    request_hash = None
+    if idempotency_key is not None:
+        image_hash = None
+        if image:
+            image_hash = hashlib.sha256(await image.read()).hexdigest()
+            await image.seek(0)
+        request_hash = fingerprint(
+            name, description, price, discount, quantity, category_id,
+            image and image.filename, image_hash
+        )
+
+    return await idempotency_store.run(
+        key=idempotency_scope(request, "product", idempotency_key),
+        call=create,
+        request_hash=request_hash
     )
-    product_response = await ProductCRUD().create(
-        product=product,
-        async_session=session
-    )
-    return product_response
 
 
 @product_router.put("/update/form/{product_id}", response_model=ProductSchema)
 async def update_product_by_form(
-    product_id: str,
+    product_id: EntityId,
     name: str = Form(),
     description: str | None = Form(None),
     price: Decimal | None = Form(None),
     discount: int | None = Form(None),
     quantity: int | None = Form(None),
-    category_id: str = Form(...),
+    category_id: Annotated[EntityId, Form()] = ...,
     image: UploadFile | None = File(None)
 ):
     "Endpoint updates a category instance"
     image_path = None
     if image:
-        image_path = await download_image(image.file.read(), f"{uuid.uuid4()}-{image.filename}")
+        image_path = await enqueue_image(await image.read(), f"{uuid.uuid4()}-{image.filename}")
     product = CreateProductSchema(
         id=product_id,
         name=name,
@@ -240,13 +369,13 @@ async def update_product_by_form(
 
 
 @product_router.put("/update/json/{product_id}", response_model=ProductSchema)
-async def update_product_by_json(product_id: str, product_data: ProductJsonSwaggerUpdateSchema):
+async def update_product_by_json(product_id: EntityId, product_data: ProductJsonSwaggerUpdateSchema):
     "Endpoint updates a category instance"
     image_path = None
     if product_data.image_base64 and product_data.image_name:
         image_data = base64.b64decode(product_data.image_base64)
         image_name = f"{uuid.uuid4()}-{product_data.image_name}"
-        image_path = await download_image_base64(bytes_data=image_data, file_name=image_name)
+        image_path = await enqueue_image(bytes_data=image_data, file_name=image_name, encoded=True)
 
     product = CreateProductSchema(
         id=product_id,
@@ -266,10 +395,126 @@ async def update_product_by_json(product_id: str, product_data: ProductJsonSwagg
 
 
 @product_router.delete("/delete/{product_id}", response_model=dict)
-async def delete_product(product_id: str):
+async def delete_product(product_id: EntityId):
     "Endpoint deletes a prooduct instance"
     await ProductCRUD().delete(
         product_id=product_id,
         async_session=session
     )
     return {"message": "Deleted"}
+
+
+@product_router.post("/reprice/preview/", response_model=list[RepricedProductSchema])
+async def preview_reprice_products(
+    reprice: RepriceSchema,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE)
+):
+    "Endpoint returns a page of new product prices without saving them"
+    rows = await ProductCRUD.preview_reprice(
+        reprice=reprice,
+        async_session=session,
+        skip=skip,
+        limit=limit
+    )
+    return [
+        RepricedProductSchema(
+            id=product_id,
+            price=price,
+            discount=discount,
+            effective_price=effective_price
+        )
+        for product_id, price, discount, effective_price in rows
+    ]
+
+
+@product_router.post("/reprice/", response_model=UpdatedResultSchema)
+async def reprice_products(reprice: RepriceSchema):
+    "Endpoint changes price or discount of many products at once"
+    updated = await ProductCRUD.reprice(
+        reprice=reprice,
+        async_session=session
+    )
+    return UpdatedResultSchema(updated=updated)
+
+
+@product_router.post("/bulk/delete/", response_model=DeletedResultSchema)
+async def bulk_delete_products(bulk: BulkDeleteSchema):
+    "Endpoint deletes products by ids or category at once"
+    deleted = await ProductCRUD.bulk_delete(
+        bulk=bulk,
+        async_session=session
+    )
+    return DeletedResultSchema(deleted=deleted)
+
+
+@product_router.post("/bulk/move/", response_model=UpdatedResultSchema)
+async def move_products_category(move: MoveCategorySchema):
+    "Endpoint moves all products of a category to another category"
+    updated = await ProductCRUD.move_category(
+        move=move,
+        async_session=session
+    )
+    return UpdatedResultSchema(updated=updated)
+
+
+
+# CHANGE FEED ENDPOINTS
+
+change_router = APIRouter(
+    prefix="/changes",
+    tags=["Changes"],
+)
+
+STREAM_KEEPALIVE = 15.0
+
+
+@change_router.get("/", response_model=list[ChangeSchema])
+async def read_changes(
+    since: int = 0,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    wait: float = Query(0, ge=0, le=30)
+):
+    "Endpoint returns changes after since, waits up to wait seconds for new ones"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        changed = change_notifier.listen()
+        changes = await ChangeCRUD.get_since(
+            since=since,
+            limit=limit,
+            async_session=session
+        )
+        timeout = deadline - loop.time()
+        if changes or timeout <= 0:
+            return changes
+        await change_notifier.wait(changed, timeout=timeout)
+
+
+@change_router.get("/stream/")
+async def stream_changes(
+    request: Request,
+    since: int = 0,
+    last_event_id: int | None = Header(None)
+):
+    "Endpoint streams changes after since as Server-Sent Events"
+    if last_event_id is not None:
+        since = last_event_id
+
+    async def events():
+        last_seq = since
+        while not await request.is_disconnected():
+            changed = change_notifier.listen()
+            changes = await ChangeCRUD.get_since(
+                since=last_seq,
+                async_session=session
+            )
+            for change in changes:
+                data = ChangeSchema.model_validate(change).model_dump_json()
+                yield f"id: {change.seq}\nevent: change\ndata: {data}\n\n"
+                last_seq = change.seq
+            if not changes:
+                yield ": keep-alive\n\n"
+                await change_notifier.wait(changed, timeout=STREAM_KEEPALIVE)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -1,9 +1,24 @@
 "Pydantic schemas/models"
 
+import uuid
 from decimal import Decimal
 from datetime import datetime
+from typing import Annotated
 
-from pydantic import BaseModel
+from pydantic import AfterValidator, BaseModel, Field, computed_field
+
+from .models import UUID_IDS
+from .pricing import effective_price as compute_effective_price
+
+
+def normalize_uuid(value: str) -> str:
+    "Function returns canonical dashed lower-case form of a UUID"
+    return str(uuid.UUID(value))
+
+
+# In UUID mode malformed ids are rejected by validation instead of the database,
+# and every accepted spelling maps to the one the database returns
+EntityId = Annotated[str, AfterValidator(normalize_uuid)] if UUID_IDS else str
 
 
 class CategoryBaseSchema(BaseModel):
@@ -19,7 +34,7 @@ class CategorySwaggerSchema(CategoryBaseSchema):
 
 class CategorySchema(CategoryBaseSchema):
     "Schema for creation and swagger response model"
-    id: str
+    id: EntityId
 
     class Config:
         "config"
@@ -34,12 +49,12 @@ class ProductBaseSchema(BaseModel):
     price: Decimal | None = Decimal(10.00)
     discount: int | None = 0
     quantity: int | None = 0
-    category_id: str | None = None
+    category_id: EntityId | None = None
 
 
 class CreateProductSchema(ProductBaseSchema):
     "Schema for product creation"
-    id: str
+    id: EntityId
     image: str | None = None
 
     class Config:
@@ -69,6 +84,12 @@ class ProductSchema(ProductBaseSchema):
     image: str | None = None
     date_created: datetime
 
+    @computed_field
+    @property
+    def effective_price(self) -> Decimal | None:
+        "Price with discount applied, rounded to cents"
+        return compute_effective_price(self.price, self.discount)
+
     class Config:
         "config"
         from_attributes = True
@@ -81,10 +102,64 @@ class ProductJsonSwaggerUpdateSchema(BaseModel):
     price: Decimal | None = None
     discount: int | None = None
     quantity: int | None = None
-    category_id: str | None = None
+    category_id: EntityId | None = None
     image_base64: bytes | None = None
     image_name: str | None = None
 
     class Config:
         "config"
         from_attributes = True
+
+
+MAX_BULK_IDS = 10000
+
+
+class RepriceSchema(BaseModel):
+    "Schema for bulk repricing by ids or category"
+    product_ids: list[EntityId] | None = Field(None, max_length=MAX_BULK_IDS)
+    category_id: EntityId | None = None
+    percent: Decimal | None = Field(None, ge=-100)
+    discount: int | None = Field(None, ge=0, le=100)
+
+
+class RepricedProductSchema(BaseModel):
+    "Schema for repricing preview"
+    id: str
+    price: Decimal
+    discount: int
+    effective_price: Decimal
+
+
+class BulkDeleteSchema(BaseModel):
+    "Schema for bulk deletion by ids or category"
+    product_ids: list[EntityId] | None = Field(None, max_length=MAX_BULK_IDS)
+    category_id: EntityId | None = None
+
+
+class MoveCategorySchema(BaseModel):
+    "Schema for moving all products of a category to another one"
+    from_category_id: EntityId
+    to_category_id: EntityId | None = None
+
+
+class UpdatedResultSchema(BaseModel):
+    "Schema for bulk update result"
+    updated: int
+
+
+class DeletedResultSchema(BaseModel):
+    "Schema for bulk deletion result"
+    deleted: int
+
+
+class ChangeSchema(BaseModel):
+    "Schema for catalog change log entry"
+    seq: int
+    entity: str
+    entity_id: str
+    operation: str
+    date_created: datetime
+
+    class Config:
+        "config"
+        from_attributes = True
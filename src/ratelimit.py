@@ -0,0 +1,161 @@
+"Module for per-client rate limiting and per-route concurrency shedding"
+
+import os
+import json
+import time
+import math
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+from .database import POOL_CONNECTIONS
+
+
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", "20"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+ROUTE_CONCURRENCY = int(os.getenv("ROUTE_CONCURRENCY", "8"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+API_KEYS = frozenset(
+    key.strip() for key in os.getenv("API_KEYS", "").split(",") if key.strip()
+)
+
+
+def client_identity(scope, api_keys: frozenset[str] = API_KEYS) -> str:
+    "Function returns configured API key of the client or its address"
+    for name, value in scope["headers"]:
+        if name == b"x-api-key":
+            key = value.decode("latin-1")
+            if key in api_keys:
+                return "key:" + key
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class RateLimitBackend(ABC):
+    """Base class of token bucket storage.
+
+    Shared backends (e.g. Redis) implement acquire() with the same
+    contract and are passed to RateLimitMiddleware instead of the
+    in-process one.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: int = RATE_LIMIT_BURST) -> None:
+        self.rate = rate
+        self.burst = burst
+
+    @abstractmethod
+    async def acquire(self, key: str) -> float:
+        "Coroutine takes a token for key, returns 0 or seconds to wait for one"
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    "Token buckets kept in process memory for the most recent clients"
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RATE,
+        burst: int = RATE_LIMIT_BURST,
+        max_clients: int = RATE_LIMIT_MAX_CLIENTS,
+    ) -> None:
+        super().__init__(rate=rate, burst=burst)
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RateLimitMiddleware:
+    """ASGI middleware limiting requests per API key or client IP.
+
+    Only keys listed in API_KEYS get their own bucket, any other key is
+    limited by the client address, so made-up keys can not bypass limits.
+    """
+
+    def __init__(
+        self,
+        app,
+        backend: RateLimitBackend | None = None,
+        api_keys: frozenset[str] = API_KEYS,
+    ) -> None:
+        self.app = app
+        self.backend = backend or MemoryRateLimitBackend()
+        self.api_keys = api_keys
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = await self.backend.acquire(client_identity(scope, self.api_keys))
+        if not retry_after:
+            await self.app(scope, receive, send)
+            return
+
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(math.ceil(retry_after)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class ConcurrencyLimiter:
+    """Dependency limiting requests running at once on each route and in total.
+
+    One instance can guard several routers, every route of them gets its
+    own counter, so a slow route does not shed the others. The total is
+    capped by database pool connections. Requests over either limit are
+    rejected with 503 right away instead of waiting for a connection.
+    """
+
+    def __init__(
+        self,
+        limit: int = ROUTE_CONCURRENCY,
+        total_limit: int = POOL_CONNECTIONS,
+        retry_after: int = 1,
+    ) -> None:
+        self.limit = limit
+        self.total_limit = total_limit
+        self.retry_after = retry_after
+        self.active: dict[tuple[str, str], int] = {}
+        self.total = 0
+
+    async def __call__(self, request: Request):
+        route = request.scope.get("route")
+        key = (request.method, getattr(route, "path", request.url.path))
+        if self.total >= self.total_limit or self.active.get(key, 0) >= self.limit:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.active[key] = self.active.get(key, 0) + 1
+        self.total += 1
+        try:
+            yield
+        finally:
+            self.total -= 1
+            self.active[key] -= 1
+            if not self.active[key]:
+                del self.active[key]
@@ -1,23 +1,51 @@
 "module for utils"
 
+import os
+import time
+import uuid
 import base64
 
 import aiofiles
+import aiofiles.os
 
 from .database import engine, Base
+from .jobs import job_queue
 
-async def create_tables() -> None:
+async def create_tables(dispose: bool = True) -> None:
     "Coroutine creates tables using Base metadata"
     async with engine.begin() as connection:
 
         await connection.run_sync(Base.metadata.create_all, checkfirst=True)
 
-    await engine.dispose()
+    if dispose:
+        await engine.dispose()
+
+
+def uuid7() -> uuid.UUID:
+    "Function returns time-ordered UUID version 7"
+    timestamp = time.time_ns() // 1_000_000
+    random = int.from_bytes(os.urandom(10), "big")
+    value = (timestamp & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= (random >> 68) << 64
+    value |= 0b10 << 62
+    value |= random & 0x3FFF_FFFF_FFFF_FFFF
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    "Function returns id for a new row, ordered by creation time"
+    return str(uuid7())
+
+
+def image_path(file_name: str) -> str:
+    "Function returns path where image with file name is saved"
+    return f"media/images/{file_name}"
 
 
 async def download_image(bytes_data: bytes, file_name: str) -> str:
     "Coroutine downloads image and returns file path"
-    file_path = f"media/images/{file_name}"
+    file_path = image_path(file_name)
     async with aiofiles.open(file=file_path, mode="wb") as file:
         await file.write(bytes_data)
 
@@ -26,8 +54,61 @@ async def download_image(bytes_data: bytes, file_name: str) -> str:
 #DOESN'T DECODE WELL. IMAGE STILL BAD
 async def download_image_base64(bytes_data: bytes, file_name: str) -> str:
     "Coroutine download image in base64 encoding and returns file path"
-    file_path = f"media/images/{file_name}"
+    file_path = image_path(file_name)
     async with aiofiles.open(file=file_path, mode="wb") as file:
         await file.write(base64.encodebytes(bytes_data))
 
     return file_path
+
+
+STAGING_DIR = "media/staging"
+
+
+@job_queue.task("download_image")
+async def download_image_job(staging_path: str, file_name: str) -> None:
+    "Job moves staged image to its path, the staged file is kept until it succeeds"
+    file_path = image_path(file_name)
+    try:
+        await aiofiles.os.replace(staging_path, file_path)
+    except FileNotFoundError:
+        # the move is already done when the job runs again after a restart
+        if not await aiofiles.os.path.exists(file_path):
+            raise
+
+
+@job_queue.task("download_image_base64")
+async def download_image_base64_job(staging_path: str, file_name: str) -> None:
+    "Job downloads staged image in base64 encoding and removes the staged file after it"
+    try:
+        async with aiofiles.open(file=staging_path, mode="rb") as file:
+            bytes_data = await file.read()
+    except FileNotFoundError:
+        if not await aiofiles.os.path.exists(image_path(file_name)):
+            raise
+        return
+    await download_image_base64(bytes_data, file_name)
+    await aiofiles.os.remove(staging_path)
+
+
+async def enqueue_image(bytes_data: bytes, file_name: str, encoded: bool = False) -> str:
+    """Coroutine stages image bytes, queues their download and returns future file path.
+
+    Staged bytes are written before the job is saved, so a pending job
+    outlives a restart; this write replaces the inline image write, and the
+    raw image job itself only renames the staged file into place.
+    """
+    await aiofiles.os.makedirs(STAGING_DIR, exist_ok=True)
+    staging_path = f"{STAGING_DIR}/{uuid.uuid4()}"
+    async with aiofiles.open(file=staging_path, mode="wb") as file:
+        await file.write(bytes_data)
+
+    try:
+        await job_queue.enqueue(
+            "download_image_base64" if encoded else "download_image",
+            staging_path=staging_path,
+            file_name=file_name,
+        )
+    except Exception:
+        await aiofiles.os.remove(staging_path)
+        raise
+    return image_path(file_name)
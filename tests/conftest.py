@@ -0,0 +1,58 @@
+"Fixtures running the application on an in-memory SQLite database"
+
+import os
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite:///:memory:"
+os.environ["DATABASE_ECHO"] = "false"
+os.environ["RATE_LIMIT_BURST"] = "100000"
+
+# pylint: disable=wrong-import-position
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+import main
+from src.idempotency import idempotency_store
+from src.products.manager import product_pages_cache
+
+
+@pytest.fixture
+def anyio_backend():
+    "Tests run on asyncio, the loop the application is served on"
+    return "asyncio"
+
+
+@pytest.fixture
+async def client(tmp_path, monkeypatch):
+    "Client of a started application with an empty database and media folder"
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "media" / "images").mkdir(parents=True)
+
+    async with main.lifespan(main.app):
+        async with AsyncClient(
+            transport=ASGITransport(app=main.app),
+            base_url="http://test"
+        ) as async_client:
+            yield async_client
+
+    # in-memory database was dropped together with its only connection
+    idempotency_store._entries.clear()  # pylint: disable=protected-access
+    product_pages_cache.invalidate()
+
+
+@pytest.fixture
+async def category(client):
+    "Category created through the API"
+    response = await client.post("/categories/add/json/", json={"name": "Phones"})
+    return response.json()
+
+
+@pytest.fixture
+async def products(client, category):
+    "Three products of the category created through the API"
+    return [
+        (await client.post(
+            "/products/add/json/",
+            json={"name": f"Phone {number}", "price": "100.00", "category_id": category["id"]}
+        )).json()
+        for number in range(3)
+    ]
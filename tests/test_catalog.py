@@ -0,0 +1,139 @@
+"Tests of category and product endpoints"
+
+from decimal import Decimal
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_create_and_list_categories(client):
+    response = await client.post("/categories/add/form/", data={"name": "Laptops"})
+    assert response.status_code == 200
+    category = response.json()
+
+    response = await client.get("/categories/list/")
+    assert response.json() == [category]
+
+    response = await client.get(f"/categories/{category['id']}")
+    assert response.json() == category
+
+
+async def test_duplicate_category_name(client, category):
+    response = await client.post("/categories/add/json/", json={"name": category["name"]})
+    assert response.status_code == 400
+
+
+async def test_create_and_list_products(client, category, products):
+    assert Decimal(products[0]["effective_price"]) == 100
+
+    response = await client.get("/products/list/", params={"category_id": category["id"]})
+    assert response.status_code == 200
+    assert sorted(product["id"] for product in response.json()) == sorted(
+        product["id"] for product in products
+    )
+
+    response = await client.get("/products/list/", params={"limit": 2})
+    assert len(response.json()) == 2
+
+
+async def test_product_list_cache_is_invalidated(client, category, products):
+    await client.get("/products/list/")
+    await client.delete(f"/products/delete/{products[0]['id']}")
+
+    response = await client.get("/products/list/")
+    assert len(response.json()) == len(products) - 1
+
+
+async def test_reprice_preview_is_paged(client, category, products):
+    reprice = {"category_id": category["id"], "percent": "10", "discount": 50}
+
+    first = await client.post("/products/reprice/preview/", params={"limit": 2}, json=reprice)
+    rest = await client.post(
+        "/products/reprice/preview/", params={"skip": 2, "limit": 2}, json=reprice
+    )
+    rows = first.json() + rest.json()
+    assert [row["id"] for row in rows] == sorted(product["id"] for product in products)
+    assert Decimal(rows[0]["price"]) == 110
+    assert Decimal(rows[0]["effective_price"]) == 55
+
+    response = await client.get(f"/products/{products[0]['id']}")
+    assert Decimal(response.json()["price"]) == 100
+
+
+async def test_reprice(client, category, products):
+    response = await client.post(
+        "/products/reprice/",
+        json={"product_ids": [products[0]["id"]], "percent": "-25"}
+    )
+    assert response.json() == {"updated": 1}
+
+    response = await client.get(f"/products/{products[0]['id']}")
+    assert Decimal(response.json()["price"]) == 75
+
+
+async def test_reprice_needs_target_and_change(client, category):
+    response = await client.post("/products/reprice/", json={"percent": "10"})
+    assert response.status_code == 400
+
+    response = await client.post("/products/reprice/", json={"category_id": category["id"]})
+    assert response.status_code == 400
+
+
+async def test_bulk_move_and_delete(client, category, products):
+    target = (await client.post("/categories/add/json/", json={"name": "Tablets"})).json()
+
+    response = await client.post(
+        "/products/bulk/move/",
+        json={"from_category_id": category["id"], "to_category_id": target["id"]}
+    )
+    assert response.json() == {"updated": len(products)}
+
+    response = await client.post(
+        "/products/bulk/delete/",
+        json={"product_ids": [products[0]["id"]]}
+    )
+    assert response.json() == {"deleted": 1}
+
+    response = await client.post("/products/bulk/delete/", json={"category_id": target["id"]})
+    assert response.json() == {"deleted": len(products) - 1}
+
+    response = await client.get("/products/list/")
+    assert response.json() == []
+
+
+async def test_idempotent_replay(client):
+    headers = {"Idempotency-Key": "create-laptops"}
+    first = await client.post("/categories/add/json/", json={"name": "Laptops"}, headers=headers)
+    second = await client.post("/categories/add/json/", json={"name": "Laptops"}, headers=headers)
+    assert second.status_code == 200
+    assert second.json() == first.json()
+
+    response = await client.get("/categories/list/")
+    assert len(response.json()) == 1
+
+
+async def test_idempotency_key_with_other_body(client):
+    headers = {"Idempotency-Key": "create"}
+    await client.post("/categories/add/json/", json={"name": "Laptops"}, headers=headers)
+
+    response = await client.post("/categories/add/json/", json={"name": "Tablets"}, headers=headers)
+    assert response.status_code == 422
+
+
+async def test_idempotent_form_replay_compares_image(client, category):
+    headers = {"Idempotency-Key": "create-phone"}
+    data = {"name": "Phone", "category_id": category["id"]}
+
+    first = await client.post(
+        "/products/add/form/", data=data, files={"image": ("phone.png", b"image")}, headers=headers
+    )
+    second = await client.post(
+        "/products/add/form/", data=data, files={"image": ("phone.png", b"image")}, headers=headers
+    )
+    assert second.json() == first.json()
+
+    response = await client.post(
+        "/products/add/form/", data=data, files={"image": ("phone.png", b"other")}, headers=headers
+    )
+    assert response.status_code == 422
@@ -0,0 +1,114 @@
+"Tests of the catalog change feed"
+
+import asyncio
+
+import pytest
+
+import main
+from src.products.manager import ChangeNotifier
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_changes_since(client, category, products):
+    response = await client.get("/changes/")
+    changes = response.json()
+    assert [(change["entity"], change["operation"]) for change in changes] == [
+        ("category", "create"),
+        *[("product", "create")] * len(products),
+    ]
+    assert [change["seq"] for change in changes] == sorted(change["seq"] for change in changes)
+
+    await client.delete(f"/products/delete/{products[0]['id']}")
+    response = await client.get("/changes/", params={"since": changes[-1]["seq"]})
+    assert [
+        (change["entity_id"], change["operation"]) for change in response.json()
+    ] == [(products[0]["id"], "delete")]
+
+
+async def test_changes_wait_for_new_entry(client):
+    waiting = asyncio.create_task(client.get("/changes/", params={"wait": 5}))
+    await asyncio.sleep(0.1)
+    assert not waiting.done()
+
+    category = (await client.post("/categories/add/json/", json={"name": "Laptops"})).json()
+    response = await asyncio.wait_for(waiting, timeout=5)
+    assert [change["entity_id"] for change in response.json()] == [category["id"]]
+
+
+async def test_notification_during_read_is_not_missed():
+    notifier = ChangeNotifier()
+    changed = notifier.listen()
+    notifier.notify()
+
+    await asyncio.wait_for(notifier.wait(changed, timeout=5), timeout=1)
+
+
+class StreamReader:
+    """Calls the application directly to read a response that never ends.
+
+    The test client waits for the whole body, so the stream is read from
+    ASGI messages and the client disconnects when the test is done.
+    """
+
+    def __init__(self, path: str, headers: dict[str, str]) -> None:
+        self.scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (name.lower().encode(), value.encode()) for name, value in headers.items()
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+        }
+        self.body = b""
+        self.received = asyncio.Condition()
+        self.disconnected = asyncio.Event()
+        self.request_sent = False
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.body":
+            async with self.received:
+                self.body += message.get("body", b"")
+                self.received.notify_all()
+
+    async def read_until(self, text: bytes) -> str:
+        "Coroutine waits until text was streamed and returns the body so far"
+        async with self.received:
+            await asyncio.wait_for(
+                self.received.wait_for(lambda: text in self.body), timeout=5
+            )
+            return self.body.decode()
+
+
+async def test_changes_stream(client, category, products):
+    changes = (await client.get("/changes/")).json()
+    reader = StreamReader("/changes/stream/", {"Last-Event-ID": str(changes[1]["seq"])})
+    app = asyncio.create_task(main.app(reader.scope, reader.receive, reader.send))
+
+    body = await reader.read_until(b": keep-alive")
+    assert [line for line in body.splitlines() if line.startswith("id: ")] == [
+        f"id: {change['seq']}" for change in changes[2:]
+    ]
+    assert "event: change" in body
+
+    created = (await client.post("/categories/add/json/", json={"name": "Tablets"})).json()
+    body = await reader.read_until(created["id"].encode())
+    assert body.count("event: change") == len(changes) - 1
+
+    reader.disconnected.set()
+    await asyncio.wait_for(app, timeout=5)
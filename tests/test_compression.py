@@ -0,0 +1,74 @@
+"Tests of negotiated compression and cached product list pages"
+
+import gzip
+
+import pytest
+from sqlalchemy import update
+
+from src import compression, session
+from src.products.manager import log_changes, product_pages_cache
+from src.products.models import Product
+
+pytestmark = pytest.mark.anyio
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "available_encodings", lambda: ("br", "gzip"))
+
+    assert compression.negotiate_encoding("gzip, deflate, br") == "br"
+    assert compression.negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert compression.negotiate_encoding("*") == "br"
+    assert compression.negotiate_encoding("br;q=0, *;q=0.1") == "gzip"
+    assert compression.negotiate_encoding("identity") is None
+    assert compression.negotiate_encoding("") is None
+
+
+def test_small_body_is_not_compressed():
+    assert compression.encode_body(b"{}", "gzip") == (b"{}", None)
+
+    body = b"x" * compression.MINIMUM_SIZE
+    encoded, encoding = compression.encode_body(body, "gzip")
+    assert encoding == "gzip"
+    assert gzip.decompress(encoded) == body
+
+
+@pytest.fixture
+async def many_products(client, category):
+    "Products enough for a list page over the compression minimum size"
+    for number in range(10):
+        await client.post(
+            "/products/add/json/",
+            json={"name": f"Phone {number}", "category_id": category["id"]}
+        )
+
+
+async def test_product_list_is_compressed_and_cached(client, many_products):
+    headers = {"Accept-Encoding": "gzip"}
+    plain = await client.get("/products/list/", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["Vary"] == "Accept-Encoding"
+
+    first = await client.get("/products/list/", headers=headers)
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["Vary"] == "Accept-Encoding"
+    assert len(product_pages_cache._entries) == 2  # pylint: disable=protected-access
+
+    second = await client.get("/products/list/", headers=headers)
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert second.json() == first.json() == plain.json()
+
+
+async def test_cached_page_follows_changes_of_other_processes(client, products):
+    await client.get("/products/list/")
+
+    # another process writes the change log, this process is not notified
+    async with session() as db_session:
+        await db_session.execute(
+            update(Product).filter(Product.id==products[0]["id"]).values(name="Renamed")
+        )
+        await log_changes(db_session, "product", [products[0]["id"]], "update")
+        await db_session.commit()
+
+    response = await client.get("/products/list/")
+    names = {product["id"]: product["name"] for product in response.json()}
+    assert names[products[0]["id"]] == "Renamed"
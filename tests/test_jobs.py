@@ -0,0 +1,80 @@
+"Tests of background jobs"
+
+import os
+import base64
+
+import aiofiles.os
+import pytest
+
+from src import job_queue, utils
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_image_is_saved_by_job(client, category):
+    done = job_queue.metrics()["done"]
+
+    response = await client.post(
+        "/products/add/form/",
+        data={"name": "Phone", "category_id": category["id"]},
+        files={"image": ("phone.png", b"image bytes")}
+    )
+    image = response.json()["image"]
+    await job_queue.join()
+
+    with open(image, "rb") as file:
+        assert file.read() == b"image bytes"
+    assert os.listdir("media/staging") == []
+
+    response = await client.get("/jobs/metrics/")
+    assert response.json()["done"] == done + 1
+
+
+def fail_once(function):
+    "Function returns wrapper of function raising OSError on the first call"
+    calls = []
+
+    async def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("disk is busy")
+        return await function(*args, **kwargs)
+
+    return wrapper
+
+
+async def test_image_job_is_retried(client, category, monkeypatch):
+    monkeypatch.setattr(job_queue, "retry_delay", 0)
+    monkeypatch.setattr(aiofiles.os, "replace", fail_once(aiofiles.os.replace))
+    retried = job_queue.metrics()["retried"]
+
+    response = await client.post(
+        "/products/add/form/",
+        data={"name": "Phone", "category_id": category["id"]},
+        files={"image": ("phone.png", b"image bytes")}
+    )
+    await job_queue.join()
+
+    with open(response.json()["image"], "rb") as file:
+        assert file.read() == b"image bytes"
+    assert os.listdir("media/staging") == []
+    assert job_queue.metrics()["retried"] == retried + 1
+
+
+async def test_base64_image_job_is_retried(client, category, monkeypatch):
+    monkeypatch.setattr(job_queue, "retry_delay", 0)
+    monkeypatch.setattr(utils, "download_image_base64", fail_once(utils.download_image_base64))
+
+    response = await client.post(
+        "/products/add/json/",
+        json={
+            "name": "Phone",
+            "category_id": category["id"],
+            "image_base64": base64.b64encode(b"image bytes").decode(),
+            "image_name": "phone.png",
+        }
+    )
+    await job_queue.join()
+
+    assert os.path.exists(response.json()["image"])
+    assert os.listdir("media/staging") == []
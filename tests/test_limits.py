@@ -0,0 +1,106 @@
+"Tests of request rate limiting and concurrency shedding"
+
+import asyncio
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from src.ratelimit import (
+    ConcurrencyLimiter,
+    MemoryRateLimitBackend,
+    RateLimitMiddleware,
+    client_identity,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def make_client(app) -> AsyncClient:
+    "Function returns a client of an ASGI application"
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+async def test_rate_limit_rejects_with_429():
+    app = FastAPI()
+    app.get("/")(lambda: {})
+    app.add_middleware(
+        RateLimitMiddleware,
+        backend=MemoryRateLimitBackend(rate=1, burst=2),
+        api_keys=frozenset({"known"})
+    )
+
+    async with make_client(app) as client:
+        statuses = [(await client.get("/")).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+        response = await client.get("/", headers={"X-Api-Key": "made-up"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+        response = await client.get("/", headers={"X-Api-Key": "known"})
+        assert response.status_code == 200
+
+
+def test_client_identity_ignores_unknown_keys():
+    scope = {"headers": [(b"x-api-key", b"made-up")], "client": ("10.0.0.1", 1234)}
+    assert client_identity(scope, frozenset()) == "ip:10.0.0.1"
+    assert client_identity(scope, frozenset({"made-up"})) == "key:made-up"
+
+
+async def test_concurrency_limit_sheds_with_503_per_route():
+    release = asyncio.Event()
+    limiter = ConcurrencyLimiter(limit=1, total_limit=2)
+    router = APIRouter(dependencies=[Depends(limiter)])
+
+    @router.get("/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @router.get("/fast")
+    async def fast():
+        return {}
+
+    app = FastAPI()
+    app.include_router(router)
+
+    async with make_client(app) as client:
+        running = asyncio.create_task(client.get("/slow"))
+        while not limiter.active:
+            await asyncio.sleep(0.01)
+
+        response = await client.get("/slow")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert (await client.get("/fast")).status_code == 200
+
+        release.set()
+        assert (await running).status_code == 200
+        assert (await client.get("/slow")).status_code == 200
+
+
+async def test_concurrency_limit_caps_all_routes():
+    release = asyncio.Event()
+    limiter = ConcurrencyLimiter(limit=2, total_limit=2)
+    app = FastAPI(dependencies=[Depends(limiter)])
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {}
+
+    @app.get("/fast")
+    async def fast():
+        return {}
+
+    async with make_client(app) as client:
+        running = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+        while limiter.total < 2:
+            await asyncio.sleep(0.01)
+
+        assert (await client.get("/fast")).status_code == 503
+
+        release.set()
+        assert [(await task).status_code for task in running] == [200, 200]
+        assert (await client.get("/fast")).status_code == 200